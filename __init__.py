@@ -6,11 +6,11 @@ from datetime import timedelta
 import logging
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.event import async_track_time_interval
 
-from .updater import Updater
-from .const import CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
+from .updater import Updater, start_timestamp_store
+from .const import CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL, DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,12 +20,26 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     poll_interval = config_entry.options.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
     updater = Updater(hass, config_entry)
 
-    hass.async_create_task(updater.async_update())
+    # entry background tasks are cancelled on unload
+    config_entry.async_create_background_task(hass, updater.async_update(), f"{DOMAIN} update")
 
     # Set up daily update
-    async def update_callback(_):
-        await updater.async_update()
+    @callback
+    def update_callback(_):
+        config_entry.async_create_background_task(hass, updater.async_update(), f"{DOMAIN} update")
 
-    async_track_time_interval(hass, update_callback, timedelta(hours=poll_interval))
+    config_entry.async_on_unload(
+        async_track_time_interval(hass, update_callback, timedelta(hours=poll_interval))
+    )
 
     return True
+
+
+async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
+    """Unload a config entry."""
+    return True
+
+
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Remove stored data of a deleted config entry."""
+    await start_timestamp_store(hass, config_entry.entry_id).async_remove()
@@ -1,21 +1,35 @@
 import sys
-import json
 import re
-import requests
-from datetime import datetime, timedelta
+import asyncio
+import aiohttp
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from zoneinfo import ZoneInfo
 from typing import NamedTuple, Optional, Dict, Any
 from enum import Enum
-from bs4 import BeautifulSoup
-from urllib.parse import urlencode
+from lxml import etree, html as lxml_html
+from urllib.parse import quote_plus, urlencode
 from dataclasses import dataclass
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 BASE_HOST = "https://www.e-st.lv"
 LOGIN_URL = f"{BASE_HOST}/lv/private/user-authentification/"
 ACCOUNT_URL = f"{BASE_HOST}/lv/private/klienta-informacija/"
 COUNTER_URL = f"{BASE_HOST}/lv/private/skara/counters/smart"
 DATA_URL = f"{BASE_HOST}/lv/private/paterini-un-norekini/paterinu-grafiki/"
 
+TZ_RIGA = ZoneInfo("Europe/Riga")
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+MAX_REDIRECTS = 3
+CONNECTIONS_PER_HOST = 8
+OVERLOAD_STATUSES = (429, 502, 503, 504)
+CHUNK_SIZE = 8192
+
 PERIOD_DAY = "D"
 PERIOD_MONTH = "M"
 PERIOD_YEAR = "Y"
@@ -24,6 +38,36 @@ GRANULARITY_NATIVE = "N"
 GRANULARITY_HOUR = "H"
 GRANULARITY_DAY = "D"
 
+def _has_class(name: str) -> str:
+    """XPath predicate matching a single class token, like CSS `.name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_SELECTORS = {
+    "chart": etree.XPath(f"//div[{_has_class('chart')}][@data-values]/@data-values", smart_strings=False),
+    "auth_form": etree.XPath(f"boolean(//form[{_has_class('authenticate')}])"),
+    "login_field": etree.XPath("//input[@name=$name]/@value", smart_strings=False),
+    "customer_details": etree.XPath(f"boolean(//div[{_has_class('customerDetails')}])"),
+    "customer_name": etree.XPath(f"normalize-space((//div[{_has_class('customerDetails')}]//h2)[1])"),
+    "customer_eic": etree.XPath(f"normalize-space((//div[{_has_class('customerDetails')}]//p)[1])"),
+    "counter_rows": etree.XPath(f"//tr[{_has_class('counter')}]/@data-filter-string", smart_strings=False),
+    "date_min": etree.XPath("//input[@id='date']/@data-min-date", smart_strings=False),
+}
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given either as seconds or an HTTP date."""
+    if not value:
+        return None
+
+    if value.strip().isdigit():
+        return float(value)
+
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+_COUNTER_RE = re.compile(r"^(.*?)\s+(\d+)\s+(\d+)$")
+
 class Direction(Enum):
     CONSUMED = "consumed"
     RETURNED = "returned"
@@ -37,6 +81,11 @@ Statistics = Dict[Direction, list[DataPoint]]
 class ApiException(Exception):
     pass
 
+class ApiOverloadException(ApiException):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 class ApiAuthException(Exception):
     pass
 
@@ -51,28 +100,53 @@ class Counter:
     address: str
 
 class Api:
-    def __init__(self, login: str, password: str):
+    def __init__(self, login: str, password: str, session: Optional[aiohttp.ClientSession] = None):
         self.login = login
         self.password = password
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                           "AppleWebKit/537.36 (KHTML, like Gecko) "
                           "Chrome/97.0.4692.71 Safari/537.36",
             "Content-Type": "application/x-www-form-urlencoded",
             "Referer": BASE_HOST,
-        })
-        self.session.max_redirects = 3
-        self.session.verify = True
+        }
+        # a session passed in is owned by the caller, otherwise one is created lazily
+        # since an aiohttp session must be bound to a running event loop
+        self.session = session
+        self._owns_session = session is None
+        # concurrent fetches share the session, only one of them may log in
+        self._login_lock = asyncio.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or (self._owns_session and self.session.closed):
+            self.session = aiohttp.ClientSession(
+                cookie_jar=aiohttp.CookieJar(),
+                connector=aiohttp.TCPConnector(limit_per_host=CONNECTIONS_PER_HOST),
+            )
+
+        return self.session
+
+    async def close(self) -> None:
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
 
     def _get_stats_url(self, options: Dict[str, Any]) -> str:
-        date = datetime.now(ZoneInfo("Europe/Riga")) - timedelta(days=1)
+        date = datetime.now(TZ_RIGA) - timedelta(days=1)
         counter_id = options.get("counter_id")
         period = options.get("period") or PERIOD_DAY
         year = options.get("year") or date.year
         month = options.get("month") or date.month
         day = options.get("day") or date.day
         granularity = options.get("granularity") or GRANULARITY_HOUR
+
+        # fixed parameter sets used by the backfill, skip urlencode
+        if period == PERIOD_DAY:
+            return (f"{DATA_URL}?counterNumber={quote_plus(counter_id)}&period={period}"
+                    f"&date={day:02d}.{month:02d}.{year}&granularity={granularity}")
+        if period == PERIOD_MONTH:
+            return (f"{DATA_URL}?counterNumber={quote_plus(counter_id)}&period={period}"
+                    f"&year={year}&month={month}&granularity={granularity}")
+
         params = {
             "counterNumber": counter_id,
             "period": period
@@ -80,17 +154,6 @@ class Api:
 
         if period == PERIOD_YEAR:
             params["year"] = year
-        elif period == PERIOD_MONTH:
-            params.update({
-                "year": year,
-                "month": month,
-                "granularity": granularity
-            })
-        elif period == PERIOD_DAY:
-            params.update({
-                "date": f"{day:02d}.{month:02d}.{year}",
-                "granularity": granularity
-            })
 
         return f"{DATA_URL}?{urlencode(params)}"
 
@@ -103,80 +166,91 @@ class Api:
             ]
         return formatted
 
-    def _fetch_stats(self, options: Dict[str, Any]) -> Dict[Any, Any]:
+    async def _fetch_stats(self, options: Dict[str, Any]) -> Dict[Any, Any]:
         url = self._get_stats_url(options)
-        content = self._fetch(url)
-        soup = BeautifulSoup(content, "lxml")
-        chart_div = soup.select_one("div.chart")
+        doc = await self._fetch(url)
+        chart_values = _SELECTORS["chart"](doc)
 
-        if not chart_div or not chart_div.has_attr("data-values"):
+        if not chart_values:
             raise ApiException("Failed extracting chart data.")
 
-        decoded = json.loads(chart_div["data-values"])
+        decoded = json_loads(chart_values[0])
 
         return self._format_stats_response(decoded)
 
-    def _fetch(self, url: str) -> Dict[Any, Any]:
-        try:
-            response = self.session.get(url, timeout=30)
+    async def _request(self, method: str, url: str, **kwargs) -> lxml_html.HtmlElement:
+        session = self._get_session()
 
+        async with session.request(
+            method, url, headers=self.headers, timeout=REQUEST_TIMEOUT, max_redirects=MAX_REDIRECTS, **kwargs
+        ) as response:
             response.raise_for_status()
 
-            content = response.text
-            soup = BeautifulSoup(content, "lxml")
+            # feed the body to the parser as it arrives instead of buffering it as str
+            parser = lxml_html.HTMLParser(encoding=response.charset or "utf-8")
+
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                parser.feed(chunk)
+
+            return parser.close()
+
+    async def _fetch(self, url: str) -> lxml_html.HtmlElement:
+        try:
+            doc = await self._request("GET", url)
 
             # Check if login form exists
-            if soup.select_one("form.authenticate"):
-                fields = ["_token", "returnUrl"]
-                values = {field: soup.select_one(f"input[name={field}]")["value"] for field in fields}
-                values.update({"login": self.login, "password": self.password})
-                login_response = self.session.post(LOGIN_URL, data=urlencode(values))
-                login_response.raise_for_status()
-                content = login_response.text
-                soup = BeautifulSoup(content, "lxml")
-
-                if soup.select_one("form.authenticate"):
-                    raise ApiAuthException("Error connecting to api. Invalid e-mail or password.")
+            if _SELECTORS["auth_form"](doc):
+                async with self._login_lock:
+                    # another fetch may have logged in meanwhile, which also rotates the _token
+                    doc = await self._request("GET", url)
+
+                    if _SELECTORS["auth_form"](doc):
+                        fields = ["_token", "returnUrl"]
+                        values = {field: _SELECTORS["login_field"](doc, name=field)[0] for field in fields}
+                        values.update({"login": self.login, "password": self.password})
+                        doc = await self._request("POST", LOGIN_URL, data=urlencode(values))
+
+                        if _SELECTORS["auth_form"](doc):
+                            raise ApiAuthException("Error connecting to api. Invalid e-mail or password.")
                     
-        except requests.RequestException as e:
+        except aiohttp.ClientResponseError as e:
+            if e.status in OVERLOAD_STATUSES:
+                retry_after = _parse_retry_after(e.headers.get("Retry-After") if e.headers else None)
+                raise ApiOverloadException(f"Failed fetching data from {url}: {repr(e)}", retry_after) from e
+
+            raise ApiException(f"Failed fetching data from {url}: {repr(e)}") from e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             raise ApiException(f"Failed fetching data from {url}: {repr(e)}") from e
-        except (KeyError, ValueError, TypeError) as e:
+        except (KeyError, IndexError, ValueError, TypeError, etree.LxmlError) as e:
             raise ApiException(f"Failed decoding or extracting data: {repr(e)}") from e
 
-        return content
+        return doc
 
 
     # Public API
-    def authenticate(self) -> Customer:
-        content = self._fetch(ACCOUNT_URL)
-        soup = BeautifulSoup(content, "lxml")
-        details = soup.select_one("div.customerDetails")
-
-        if not details:
+    async def authenticate(self) -> Customer:
+        doc = await self._fetch(ACCOUNT_URL)
+        if not _SELECTORS["customer_details"](doc):
             raise ApiException("Customer details not found.")
+
+        eic_text = _SELECTORS["customer_eic"](doc)
         
-        full_name = details.find("h2").get_text(strip=True) if details.find("h2") else None
-        eic_code = details.find("p").get_text(strip=True).split()[-1] if details.find("p") else None
+        full_name = _SELECTORS["customer_name"](doc) or None
+        eic_code = eic_text.split()[-1] if eic_text else None
 
         return Customer(full_name, eic_code)
     
-    def get_counters(self) -> list[Counter]:
-        content = self._fetch(COUNTER_URL)
-        soup = BeautifulSoup(content, "lxml")
-        counter_rows = soup.select("tr.counter")
+    async def get_counters(self) -> list[Counter]:
+        doc = await self._fetch(COUNTER_URL)
+        counter_strings = _SELECTORS["counter_rows"](doc)
 
-        if not counter_rows:
+        if not counter_strings:
             raise ApiException("No counters found.")
 
         counters = []
 
-        for row in counter_rows:
-            if not row.has_attr("data-filter-string"):
-                raise ApiException("Failed extracting counter data.")
-
-            counter_string = row["data-filter-string"]
-            
-            match = re.match(r"^(.*)\s+(\d+)\s+(\d+)$", counter_string)
+        for counter_string in counter_strings:
+            match = _COUNTER_RE.match(counter_string)
 
             if not match:
                 raise ApiException(f"String format not recognized: {counter_string}")
@@ -187,8 +261,8 @@ class Api:
 
         return counters
 
-    def get_day_data(self, counter_id: str, year: Optional[int] = None, month: Optional[int] = None, day: Optional[int] = None, granularity: str = GRANULARITY_NATIVE):
-        return self._fetch_stats({
+    async def get_day_data(self, counter_id: str, year: Optional[int] = None, month: Optional[int] = None, day: Optional[int] = None, granularity: str = GRANULARITY_NATIVE):
+        return await self._fetch_stats({
             "counter_id": counter_id,
             "period": PERIOD_DAY,
             "year": year,
@@ -197,8 +271,8 @@ class Api:
             "granularity": granularity,
         })
 
-    def get_month_data(self, counter_id: str, year: Optional[int] = None, month: Optional[int] = None, granularity: str = GRANULARITY_DAY):
-        return self._fetch_stats({
+    async def get_month_data(self, counter_id: str, year: Optional[int] = None, month: Optional[int] = None, granularity: str = GRANULARITY_DAY):
+        return await self._fetch_stats({
             "counter_id": counter_id,
             "period": PERIOD_MONTH,
             "year": year,
@@ -206,15 +280,15 @@ class Api:
             "granularity": granularity,
         })
 
-    def get_year_data(self, counter_id: str, year: Optional[int] = None):
-        return self._fetch_stats({
+    async def get_year_data(self, counter_id: str, year: Optional[int] = None):
+        return await self._fetch_stats({
             "counter_id": counter_id,
             "period": PERIOD_YEAR,
             "year": year,
         })
 
-    def get_start_timestamp(self, counter_id: str) -> Optional[int]:
-        date = datetime.now(ZoneInfo("Europe/Riga"))
+    async def get_start_timestamp(self, counter_id: str) -> Optional[int]:
+        date = datetime.now(TZ_RIGA)
         url = self._get_stats_url({
             "counter_id": counter_id,
             "period": PERIOD_DAY,
@@ -223,13 +297,12 @@ class Api:
             "day": date.day,
             "granularity": GRANULARITY_HOUR,
         })
-        content = self._fetch(url)
-        soup = BeautifulSoup(content, "lxml")
-        date_input = soup.select_one("input#date")
+        doc = await self._fetch(url)
+        min_dates = _SELECTORS["date_min"](doc)
 
-        if not date_input or not date_input.has_attr("data-min-date"):
+        if not min_dates:
             return None
         
         return (datetime
-            .strptime(date_input["data-min-date"], "%Y-%m-%d")
-            .replace(tzinfo=ZoneInfo("Europe/Riga")).timestamp())
\ No newline at end of file
+            .strptime(min_dates[0], "%Y-%m-%d")
+            .replace(tzinfo=TZ_RIGA).timestamp())
\ No newline at end of file
@@ -37,11 +37,13 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     api = Api(data[CONF_EMAIL], data[CONF_PASSWORD])
 
     try:
-        customer_info = await hass.async_add_executor_job(api.authenticate)
+        customer_info = await api.authenticate()
     except ApiAuthException as err:
         raise InvalidAuth from err
     except ApiException as err:
         raise CannotConnect from err
+    finally:
+        await api.close()
     
     return {
         "title": f"{customer_info.full_name} ({customer_info.eic_code})",
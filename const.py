@@ -7,4 +7,6 @@ CONF_PASSWORD = "password"
 CONF_SCAN_INTERVAL = "scan_interval"
 
 DEFAULT_SCAN_INTERVAL = 3
-MIN_SCAN_INTERVAL = 1
\ No newline at end of file
+MIN_SCAN_INTERVAL = 1
+
+STORAGE_VERSION = 1
@@ -1,26 +1,89 @@
 """E-ST integration using DataUpdateCoordinator."""
 
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-from typing import Optional
+from typing import Iterator, Optional
 
 
 import logging
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import UpdateFailed
 from homeassistant.const import UnitOfEnergy
 from homeassistant.components.recorder import get_instance
 from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
 
 
-from .api import Api, ApiAuthException, Counter, DataPoint, Direction, GRANULARITY_HOUR
-from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD
+from .api import Api, ApiAuthException, ApiOverloadException, Counter, DataPoint, Direction, GRANULARITY_HOUR, TZ_RIGA
+from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD, STORAGE_VERSION
 
 _LOGGER = logging.getLogger(__name__)
 
+FETCH_CONCURRENCY = 4
+FETCH_CONCURRENCY_MAX = 8
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 2
+
+
+def start_timestamp_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store with the counter start timestamps of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}_start_{entry_id}")
+
+
+def iter_months(start: datetime, end: datetime) -> Iterator[tuple[int, int]]:
+    """Yield (year, month) pairs from start to end, both inclusive."""
+    year, month = start.year, start.month
+
+    while (year, month) <= (end.year, end.month):
+        yield (year, month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on overload and grows by one after a run of successes."""
+
+    def __init__(self, limit: int, maximum: int) -> None:
+        self.limit = limit
+        self.maximum = maximum
+        self._active = 0
+        self._successes = 0
+        # bumped on every reduction, requests started before it don't count as a new overload
+        self._generation = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> int:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+
+            return self._generation
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    async def success(self) -> None:
+        async with self._condition:
+            self._successes += 1
+
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def overload(self, generation: int) -> None:
+        if generation != self._generation:
+            return
+
+        self.limit = max(1, self.limit // 2)
+        self._successes = 0
+        self._generation += 1
+
 
 class Updater():
     counters: list[Counter]
@@ -30,16 +93,32 @@ class Updater():
 
         self.hass = hass
         self.config_entry = config_entry
-        self.api = Api(config_entry.data[CONF_EMAIL], config_entry.data[CONF_PASSWORD])
+        # own session for a private cookie jar, Home Assistant closes it on unload and shutdown
+        self.api = Api(
+            config_entry.data[CONF_EMAIL],
+            config_entry.data[CONF_PASSWORD],
+            async_create_clientsession(hass),
+        )
         self.counters = []
-        self.time_zone = ZoneInfo("Europe/Riga")
+        self.time_zone = TZ_RIGA
+        self._limiter = AdaptiveLimiter(FETCH_CONCURRENCY, FETCH_CONCURRENCY_MAX)
+        # counter start timestamps survive restarts, they are only needed until the first statistic exists
+        self._start_store = start_timestamp_store(hass, config_entry.entry_id)
+        self._start_timestamps: Optional[dict[str, float]] = None
 
     async def async_update(self):
         # add seonsors only on first run
         await self._set_counters()
+        await self._load_start_timestamps()
 
-        for counter in self.counters:
-            await self.async_add_counter_statistics(counter)    
+        results = await asyncio.gather(
+            *(self.async_add_counter_statistics(counter) for counter in self.counters),
+            return_exceptions=True,
+        )
+
+        for counter, result in zip(self.counters, results):
+            if isinstance(result, Exception):
+                _LOGGER.error(f"Failed adding counter statistics - counter: {counter.id}, error: {result}")
 
     async def async_add_counter_statistics(self, counter: Counter) -> None:
         _LOGGER.info(f"Adding counter statistics - counter: {counter.id}")
@@ -48,68 +127,80 @@ class Updater():
         returned_statistic_id = self.get_statistic_id(counter, Direction.RETURNED)
         today_start = datetime.now(self.time_zone).replace(hour=0, minute=0, second=0, microsecond=0)
 
-        last_timestamp, consumption_sum = await self.async_get_last_statistic(consumed_statistic_id)
-        _, returned_sum = await self.async_get_last_statistic(returned_statistic_id)
+        (last_timestamp, consumption_sum), (_, returned_sum) = await self.async_get_last_statistics_pair(
+            [consumed_statistic_id, returned_statistic_id]
+        )
 
         if not last_timestamp:
-            start_timestamp = await self._async_fetch_api(self.api.get_start_timestamp, counter.id)
+            start_timestamp = await self._async_get_start_timestamp(counter)
 
             if not start_timestamp:
                 _LOGGER.warning(f"No starting point - counter: {counter.id}")
                 return
 
-            last_timestamp = (datetime.fromtimestamp(start_timestamp, self.time_zone)
-                .replace(hour=0, minute=0, second=0, microsecond=0)
-                - timedelta(days=1)).timestamp()
-        
-        while True:
-            #next iteration from next day
+            start_date = (datetime.fromtimestamp(start_timestamp, self.time_zone)
+                .replace(hour=0, minute=0, second=0, microsecond=0))
+            last_timestamp = (start_date - timedelta(days=1)).timestamp()
+        else:
+            #start from next day
             start_date = (datetime.fromtimestamp(last_timestamp, self.time_zone)
                 .replace(hour=0, minute=0, second=0, microsecond=0)
                 + timedelta(days=1))
-            
-            _LOGGER.info(
-                f"Interval - from: {start_date.strftime('%Y-%m-%d %H:%M:%S')}, to: {today_start.strftime('%Y-%m-%d %H:%M:%S')}, counter: {counter.id}"
-            )
-
-            if start_date >= today_start:
-                _LOGGER.info(f"Start date greater than or equal to today - counter: {counter.id}")
-
-                return
 
-            data_points = await self._async_fetch_api(
-                self.api.get_month_data,
-                counter.id,
-                start_date.year,
-                start_date.month,
-                GRANULARITY_HOUR,
-            )
+        _LOGGER.info(
+            f"Interval - from: {start_date.strftime('%Y-%m-%d %H:%M:%S')}, to: {today_start.strftime('%Y-%m-%d %H:%M:%S')}, counter: {counter.id}"
+        )
 
-            if not data_points:
-                break
+        if start_date >= today_start:
+            _LOGGER.info(f"Start date greater than or equal to today - counter: {counter.id}")
 
-            current_timestamp, consumption_sum = await self.async_add_direction_statistics(
-                counter,
-                Direction.CONSUMED,
-                data_points[Direction.CONSUMED.value],
-                last_timestamp,
-                consumption_sum,
-            )
+            return
 
-            _, returned_sum = await self.async_add_direction_statistics(
-                counter,
-                Direction.RETURNED,
-                data_points[Direction.RETURNED.value],
-                last_timestamp,
-                returned_sum,
+        # months are known upfront, fetch them all at once and add sums in order as they arrive
+        months = list(iter_months(start_date, today_start - timedelta(days=1)))
+        tasks = [
+            asyncio.create_task(
+                self._async_fetch_api(self.api.get_month_data, counter.id, year, month, GRANULARITY_HOUR)
             )
+            for year, month in months
+        ]
 
-            # nothing has been added
-            if current_timestamp == last_timestamp:
-                _LOGGER.info(f"Nothing has been added - counter {counter.id}")
-                return
-            
-            last_timestamp = current_timestamp
+        try:
+            for task in tasks:
+                # a failed month re-raises here, statistics of earlier months are already saved
+                data_points = await task
+
+                if not data_points:
+                    break
+
+                current_timestamp, consumption_sum = await self.async_add_direction_statistics(
+                    counter,
+                    Direction.CONSUMED,
+                    data_points[Direction.CONSUMED.value],
+                    last_timestamp,
+                    consumption_sum,
+                )
+
+                _, returned_sum = await self.async_add_direction_statistics(
+                    counter,
+                    Direction.RETURNED,
+                    data_points[Direction.RETURNED.value],
+                    last_timestamp,
+                    returned_sum,
+                )
+
+                # nothing has been added
+                if current_timestamp == last_timestamp:
+                    _LOGGER.info(f"Nothing has been added - counter {counter.id}")
+                    return
+                
+                last_timestamp = current_timestamp
+        finally:
+            # stop fetches that are no longer needed and collect their results
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     async def async_add_direction_statistics(
         self,
@@ -119,7 +210,8 @@ class Updater():
         last_timestamp: int,
         sum: float,
     ) -> tuple[int, float]:
-        stats = []
+        # (start, sum) pairs, converted to statistic dicts only when saved
+        stats: list[tuple[datetime, float]] = []
         metadata = {
             "source": DOMAIN,
             "name": self.get_statistic_name(counter, direction),
@@ -133,8 +225,8 @@ class Updater():
         current_timestamp = last_timestamp
 
         for point in data_points:
-            dt = datetime.fromtimestamp(point.timestamp, self.time_zone) - timedelta(hours=1)
-            point_timestamp = dt.timestamp()
+            # points mark the end of the hour, statistics are keyed by its start
+            point_timestamp = point.timestamp - 3600
 
             if current_timestamp >= point_timestamp:
                 continue
@@ -142,42 +234,49 @@ class Updater():
             current_timestamp = point_timestamp
             sum += point.value
 
-            stats.append({
-                "start": dt,
-                "sum": sum,
-            })
+            stats.append((datetime.fromtimestamp(point_timestamp, self.time_zone), sum))
 
-        first = stats[0]
-        last = stats[-1]
+        if stats:
+            first_start, first_sum = stats[0]
+            last_start, last_sum = stats[-1]
 
-        if first:
-            _LOGGER.debug(f"Stats added - id: {metadata['statistic_id']}, from: {first['start'].strftime('%Y-%m-%d %H:%M:%S')} {first['sum']}, to: {last['start'].strftime('%Y-%m-%d %H:%M:%S')} {last['sum']}")
-        else:
-            _LOGGER.debug(f"No satats added - id: {metadata['statistic_id']}")
+            _LOGGER.debug(f"Stats added - id: {metadata['statistic_id']}, from: {first_start.strftime('%Y-%m-%d %H:%M:%S')} {first_sum}, to: {last_start.strftime('%Y-%m-%d %H:%M:%S')} {last_sum}")
 
-        if (stats):
-            async_add_external_statistics(self.hass, metadata, stats)
+            async_add_external_statistics(
+                self.hass, metadata, [{"start": start, "sum": value} for start, value in stats]
+            )
+        else:
+            _LOGGER.debug(f"No stats added - id: {metadata['statistic_id']}")
 
         return (current_timestamp, sum)
 
-    async def async_get_last_statistic(self, statistic_id: str) -> tuple[Optional[int], Optional[float]]:
-        """Get the last recorded timestamp and cumulative kWh for a given statistic_id.
+    async def async_get_last_statistics_pair(self, statistic_ids: list[str]) -> list[tuple[Optional[int], Optional[float]]]:
+        """Get the last recorded timestamp and cumulative kWh for each of the given statistic_ids.
+
+        All ids are looked up within a single recorder executor job.
 
         Returns:
-            tuple: (last_timestamp, last_cumulative_kwh)
+            list: (last_timestamp, last_cumulative_kwh) for each id, in order
                    - last_timestamp: datetime of last saved record, or None if DB is empty
                    - last_cumulative_kwh: last cumulative value, or 0.0 if DB is empty
         """
-        last_stats = await get_instance(self.hass).async_add_executor_job(
-            get_last_statistics, self.hass, 1, statistic_id, True, {"sum"}
+        return await get_instance(self.hass).async_add_executor_job(
+            self._get_last_statistics, statistic_ids
         )
 
-        if last_stats and statistic_id in last_stats:
-            last_record = last_stats[statistic_id][0]
+    def _get_last_statistics(self, statistic_ids: list[str]) -> list[tuple[Optional[int], Optional[float]]]:
+        results = []
+
+        for statistic_id in statistic_ids:
+            last_stats = get_last_statistics(self.hass, 1, statistic_id, True, {"sum"})
 
-            return (last_record["start"], last_record["sum"])
+            if last_stats and statistic_id in last_stats:
+                last_record = last_stats[statistic_id][0]
+                results.append((last_record["start"], last_record["sum"]))
+            else:
+                results.append((None, 0.0))
 
-        return (None, 0.0)
+        return results
     
     def get_statistic_name(self, counter: Counter, direction: Direction) -> str:
         return f"{counter.address} ({counter.id}) {direction.value}"
@@ -191,11 +290,44 @@ class Updater():
 
         self.counters = await self._async_fetch_api(self.api.get_counters)
     
+    async def _load_start_timestamps(self) -> None:
+        if self._start_timestamps is not None:
+            return
+
+        self._start_timestamps = await self._start_store.async_load() or {}
+
+    async def _async_get_start_timestamp(self, counter: Counter) -> Optional[float]:
+        if counter.id not in self._start_timestamps:
+            start_timestamp = await self._async_fetch_api(self.api.get_start_timestamp, counter.id)
+
+            if not start_timestamp:
+                return None
+
+            self._start_timestamps[counter.id] = start_timestamp
+            await self._start_store.async_save(self._start_timestamps)
+
+        return self._start_timestamps[counter.id]
+    
     async def _async_fetch_api(self, func, *args, **kwargs):
         try:
-            return await self.hass.async_add_executor_job(func, *args, **kwargs)
+            for attempt in range(FETCH_RETRIES + 1):
+                try:
+                    async with self._limiter as generation:
+                        result = await func(*args, **kwargs)
+                except ApiOverloadException as err:
+                    self._limiter.overload(generation)
+
+                    if attempt == FETCH_RETRIES:
+                        raise
+
+                    delay = err.retry_after if err.retry_after is not None else FETCH_BACKOFF * 2 ** attempt
+                    _LOGGER.warning(f"API overloaded, retrying in {delay}s with concurrency {self._limiter.limit}: {err}")
+                    await asyncio.sleep(delay)
+                else:
+                    await self._limiter.success()
+
+                    return result
         except ApiAuthException as err:
-            _LOGGER.error(err)
             raise UpdateFailed(err) from err
         except Exception as err:
             # This will show entities as unavailable by raising UpdateFailed exception